@@ -1,27 +1,65 @@
 import argparse
+import concurrent.futures
 import csv
+import heapq
+import math
+import multiprocessing
+import os
 import sys
-from typing import Set
+import tempfile
+import zlib
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple
 
+# Rough bytes of memory per byte of CSV input when the IDs are held in sets
+# (string objects, set slots, the differences and their sorted lists)
+MEMORY_PER_CSV_BYTE = 16
 
-def get_ids_from_csv(file_path: str) -> Set[str]:
-    """Read the 'id' or 'pid' column from a CSV file and return a set of ids."""
-    ids = set()
+# Combined input size from which the two files are parsed in parallel processes
+# (below it, starting a process costs more than it saves)
+CONCURRENT_MIN_BYTES = 4 * 1024 * 1024
+
+# Upper bound on the number of on-disk buckets (each bucket keeps files open
+# while the sorted differences are merged); larger bucket pairs are split again
+MAX_BUCKETS = 256
+
+# Times a bucket pair that is still over the memory budget is split again
+MAX_SPLIT_DEPTH = 4
+
+# Bucket pairs smaller than this are never split again, however small the budget
+MIN_SPLIT_BYTES = 64 * 1024
+
+
+def _id_column_index(fieldnames: List[str]) -> Optional[int]:
+    """
+    Position of the 'id' (or else 'pid') column, matched case-insensitively.
+    Mirrors csv.DictReader: when a name repeats, the last such column wins.
+    """
+    lower_fieldnames = {f.lower(): f for f in fieldnames if f}
+    if "id" in lower_fieldnames:
+        id_col = lower_fieldnames["id"]
+    elif "pid" in lower_fieldnames:
+        id_col = lower_fieldnames["pid"]
+    else:
+        return None
+    return len(fieldnames) - 1 - fieldnames[::-1].index(id_col)
+
+
+def iter_ids_from_csv(file_path: str) -> Iterator[str]:
+    """
+    Yield the values of the 'id' or 'pid' column of a CSV file, row by row.
+    Only the id column is read from each row (no per-row dicts).
+    """
     try:
         with open(file_path, mode="r", encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            if reader.fieldnames is None:
+            reader = csv.reader(f)
+            fieldnames = next(reader, None)
+            if fieldnames is None:
                 print(f"Error: No columns found in {file_path}", file=sys.stderr)
                 sys.exit(1)
 
-            id_col = None
-            lower_fieldnames = {f.lower(): f for f in reader.fieldnames if f}
-            if "id" in lower_fieldnames:
-                id_col = lower_fieldnames["id"]
-            elif "pid" in lower_fieldnames:
-                id_col = lower_fieldnames["pid"]
-
-            if id_col is None:
+            id_index = _id_column_index(fieldnames)
+            if id_index is None:
                 print(
                     f"Error: Neither 'id' nor 'pid' column found in {file_path}",
                     file=sys.stderr,
@@ -29,16 +67,255 @@ def get_ids_from_csv(file_path: str) -> Set[str]:
                 sys.exit(1)
 
             for row in reader:
-                val = row.get(id_col)
-                if val:
-                    ids.add(val.strip())
+                # Short rows have no value for the column, like DictReader's None
+                if len(row) > id_index:
+                    val = row[id_index]
+                    if val:
+                        yield val.strip()
     except FileNotFoundError:
         print(f"Error: File not found {file_path}", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"Error reading {file_path}: {e}", file=sys.stderr)
         sys.exit(1)
-    return ids
+
+
+def get_ids_from_csv(file_path: str) -> Set[str]:
+    """Read the 'id' or 'pid' column from a CSV file and return a set of ids."""
+    return set(iter_ids_from_csv(file_path))
+
+
+def _total_size(file_paths: Iterable[str]) -> int:
+    total = 0
+    for file_path in file_paths:
+        try:
+            total += os.path.getsize(file_path)
+        except OSError:
+            # Reported by iter_ids_from_csv
+            pass
+    return total
+
+
+def _run_pair(
+    func: Callable[..., Any], args1: Tuple[Any, ...], args2: Tuple[Any, ...]
+) -> Tuple[Any, Any]:
+    """
+    Return (func(*args1), func(*args2)). For large inputs on a multi-core
+    machine the second call runs in a child process while this process
+    handles the first, so the wall time approaches that of the slower call.
+    """
+    concurrent_ok = (os.cpu_count() or 1) > 1 and "fork" in (
+        multiprocessing.get_all_start_methods()
+    )
+    if not concurrent_ok or _total_size([args1[0], args2[0]]) < CONCURRENT_MIN_BYTES:
+        return func(*args1), func(*args2)
+
+    context = multiprocessing.get_context("fork")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        future = executor.submit(func, *args2)
+        result1 = func(*args1)
+        return result1, future.result()
+
+
+def _bucket_count(file_paths: Iterable[str], memory_budget: int) -> int:
+    """Number of buckets needed so that one bucket fits in memory_budget bytes."""
+    total = _total_size(file_paths)
+    needed = math.ceil(total * MEMORY_PER_CSV_BYTE / max(memory_budget, 1))
+    return min(MAX_BUCKETS, max(1, needed))
+
+
+def _write_buckets(
+    ids: Iterable[str], bucket_paths: List[str], bucket_of: Callable[[str], int]
+) -> None:
+    """Write ids into the bucket files chosen by bucket_of(uid) % len(bucket_paths)."""
+    with ExitStack() as stack:
+        writers = []
+        for bucket_path in bucket_paths:
+            f = stack.enter_context(
+                open(bucket_path, "w", encoding="utf-8", newline="")
+            )
+            writers.append(csv.writer(f))
+
+        for uid in ids:
+            writers[bucket_of(uid) % len(writers)].writerow([uid])
+
+
+def _crc32(uid: str) -> int:
+    return zlib.crc32(uid.encode("utf-8"))
+
+
+def _partition_ids(file_path: str, bucket_paths: List[str]) -> None:
+    """Write the IDs of file_path into bucket files chosen by a hash of the ID."""
+    _write_buckets(iter_ids_from_csv(file_path), bucket_paths, _crc32)
+
+
+def _read_bucket(bucket_path: str) -> Set[str]:
+    with open(bucket_path, encoding="utf-8", newline="") as f:
+        return {row[0] for row in csv.reader(f)}
+
+
+def _write_sorted(ids: Set[str], path: str) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([uid] for uid in sorted(ids))
+
+
+def _iter_sorted(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            yield row[0]
+
+
+def _diff_bucket(
+    ids1_path: str,
+    ids2_path: str,
+    unique1_path: str,
+    unique2_path: str,
+    memory_budget: Optional[int],
+    depth: int = 0,
+) -> None:
+    """
+    Write the sorted IDs unique to each of two bucket files, then remove the
+    bucket files. A bucket pair still too large for memory_budget (e.g. once
+    the bucket count is capped at MAX_BUCKETS) is split again by another hash
+    of the ID and the sorted results of its parts are merged. With no
+    memory_budget the pair is diffed as it is.
+    """
+    size = _total_size([ids1_path, ids2_path])
+    needed = 1
+    if memory_budget is not None and size >= MIN_SPLIT_BYTES:
+        needed = _bucket_count([ids1_path, ids2_path], memory_budget)
+    if needed > 1 and depth < MAX_SPLIT_DEPTH:
+        parts = {
+            name: [f"{path}.{i}" for i in range(needed)]
+            for name, path in (
+                ("ids1", ids1_path),
+                ("ids2", ids2_path),
+                ("unique1", unique1_path),
+                ("unique2", unique2_path),
+            )
+        }
+
+        def bucket_of(uid: str) -> int:
+            # Independent of the crc32 that put these IDs in the same bucket
+            return hash((depth, uid))
+
+        for name, path in (("ids1", ids1_path), ("ids2", ids2_path)):
+            _write_buckets(_iter_sorted(path), parts[name], bucket_of)
+            os.remove(path)
+
+        for i in range(needed):
+            _diff_bucket(
+                parts["ids1"][i],
+                parts["ids2"][i],
+                parts["unique1"][i],
+                parts["unique2"][i],
+                memory_budget,
+                depth + 1,
+            )
+
+        for name, path in (("unique1", unique1_path), ("unique2", unique2_path)):
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                sorted_ids = heapq.merge(*[_iter_sorted(p) for p in parts[name]])
+                csv.writer(f).writerows([uid] for uid in sorted_ids)
+            for part in parts[name]:
+                os.remove(part)
+        return
+
+    if needed > 1:
+        print(
+            f"Warning: a bucket of {size // 2**20} MB "
+            "could not be split further and may exceed the memory budget",
+            file=sys.stderr,
+        )
+    ids1 = _read_bucket(ids1_path)
+    ids2 = _read_bucket(ids2_path)
+    _write_sorted(ids1 - ids2, unique1_path)
+    _write_sorted(ids2 - ids1, unique2_path)
+    del ids1, ids2
+    os.remove(ids1_path)
+    os.remove(ids2_path)
+
+
+@contextmanager
+def unique_ids_external(
+    file1: str,
+    file2: str,
+    memory_budget: int,
+    buckets: Optional[int] = None,
+    tmp_dir: Optional[str] = None,
+) -> Iterator[Tuple[Iterator[str], Iterator[str]]]:
+    """
+    Find the IDs unique to each file without holding either file in memory.
+    IDs are hash-partitioned from both files into on-disk buckets sized for
+    memory_budget bytes; each bucket pair is diffed in memory, its sorted
+    differences are written back to disk and finally merged. Yields two
+    iterators over the sorted IDs unique to file1 and to file2 (the same
+    sequences as sorted(ids1 - ids2) and sorted(ids2 - ids1)). Unless the
+    number of buckets is given, buckets that are still over the budget are
+    split again (see _diff_bucket).
+    """
+    split_budget: Optional[int] = None
+    if buckets is None:
+        buckets = _bucket_count([file1, file2], memory_budget)
+        split_budget = memory_budget
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix="check_pids-") as work_dir:
+        paths = {
+            name: [os.path.join(work_dir, f"{name}-{i}.csv") for i in range(buckets)]
+            for name in ("ids1", "ids2", "unique1", "unique2")
+        }
+        _run_pair(_partition_ids, (file1, paths["ids1"]), (file2, paths["ids2"]))
+
+        for i in range(buckets):
+            _diff_bucket(
+                paths["ids1"][i],
+                paths["ids2"][i],
+                paths["unique1"][i],
+                paths["unique2"][i],
+                split_budget,
+            )
+
+        yield (
+            heapq.merge(*[_iter_sorted(path) for path in paths["unique1"]]),
+            heapq.merge(*[_iter_sorted(path) for path in paths["unique2"]]),
+        )
+
+
+def print_unique_ids(
+    file1: str,
+    file2: str,
+    unique_to_file1: Iterable[str],
+    unique_to_file2: Iterable[str],
+) -> None:
+    """Print the sorted IDs unique to each file."""
+    found = False
+
+    for i, uid in enumerate(unique_to_file1):
+        if i == 0:
+            print(f"--- IDs unique to {file1} ---")
+            found = True
+        print(uid)
+
+    for i, uid in enumerate(unique_to_file2):
+        if i == 0:
+            print()
+            print(f"--- IDs unique to {file2} ---")
+            found = True
+        print(uid)
+
+    if not found:
+        print("No unique IDs found. Both files contain the exact same IDs.")
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for sizes that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value!r}")
+    return number
 
 
 def main() -> None:
@@ -48,28 +325,38 @@ def main() -> None:
     )
     parser.add_argument("file1", help="Path to the first CSV file")
     parser.add_argument("file2", help="Path to the second CSV file")
+    parser.add_argument(
+        "--memory-budget",
+        type=_positive_int,
+        metavar="MB",
+        help="Diff very large files through on-disk buckets, "
+        "keeping roughly this many megabytes of IDs in memory",
+    )
+    parser.add_argument(
+        "--tmp-dir",
+        help="Directory for the on-disk buckets (default: system temp directory)",
+    )
 
     args = parser.parse_args()
 
-    ids1 = get_ids_from_csv(args.file1)
-    ids2 = get_ids_from_csv(args.file2)
+    if args.memory_budget is not None:
+        with unique_ids_external(
+            args.file1,
+            args.file2,
+            args.memory_budget * 1024 * 1024,
+            tmp_dir=args.tmp_dir,
+        ) as (unique_to_file1, unique_to_file2):
+            print_unique_ids(args.file1, args.file2, unique_to_file1, unique_to_file2)
+        return
+
+    ids1, ids2 = _run_pair(get_ids_from_csv, (args.file1,), (args.file2,))
 
     unique_to_file1 = ids1 - ids2
     unique_to_file2 = ids2 - ids1
 
-    if unique_to_file1:
-        print(f"--- IDs unique to {args.file1} ---")
-        for uid in sorted(unique_to_file1):
-            print(uid)
-
-    if unique_to_file2:
-        print()
-        print(f"--- IDs unique to {args.file2} ---")
-        for uid in sorted(unique_to_file2):
-            print(uid)
-
-    if not unique_to_file1 and not unique_to_file2:
-        print("No unique IDs found. Both files contain the exact same IDs.")
+    print_unique_ids(
+        args.file1, args.file2, sorted(unique_to_file1), sorted(unique_to_file2)
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,553 @@
+"""
+Synthetic cohort generator and benchmark runner for pbk_styling.
+
+Generate a cohort (same columns as the real registrar exports):
+
+    python pbk_benchmark.py generate --size 10k --output bench_data
+
+Benchmark every stage of a report run against it:
+
+    python pbk_benchmark.py run --data-dir bench_data --workers 1,2,4
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import pbk_styling
+
+# Cohort presets: number of students (class rows default to 10 per student)
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+CLASSES_PER_STUDENT = 10
+
+SCREENING_HEADER = [
+    "Full Name",
+    "First Name",
+    "Middle Name",
+    "Last Name",
+    "PID",
+    "College",
+    "Major Code",
+    "Major Description",
+    "Class Level",
+    "Gender",
+    "Cumulative Units",
+    "Cumulative GPA",
+    "Email(UCSD)",
+    "Permanent Mailing Addresss Line 1",
+    "Permanent Mailing City Line 1",
+    "Permanent Mailing State Line 1",
+    "Permanent Mailing Zip Code Line 1",
+    "Permanent Mailing Country Line 1",
+    "Permanent Phone Number",
+    "Graduating Quarter",
+    "Registration Status",
+    "Apln Term",
+]
+
+CLASSES_HEADER = [
+    "id",
+    "dept",
+    "crsnum",
+    "termcode",
+    "section",
+    "section_id",
+    "units",
+    "grade",
+    "repeat_code",
+    "repeat_fl",
+    "credittype",
+    "enrolled_status",
+    "grade_option",
+    "course_level",
+    "course_title",
+    "primary_instructor",
+]
+
+# Shared by the AP, IB and transfer class files
+EXTERNAL_CLASSES_HEADER = [
+    "id",
+    "entityid",
+    "entityname",
+    "dept",
+    "crsnum",
+    "title",
+    "term",
+    "term_seq",
+    "units",
+    "grade",
+    "course_level",
+    "tranafct",
+    "approx_flag",
+    "approx_course_dept",
+    "approx_course_crsnum",
+    "term_received",
+    "attend_from",
+    "attend_to",
+    "approx_group_id",
+    "approx_group_type",
+    "refresh",
+    "download_shared_unique_key",
+]
+
+COURSECRIT_HEADER = [
+    "courseid",
+    "department",
+    "coursenumber",
+    "courseletter",
+    "anyUD",
+    "classtype",
+]
+
+COLLEGES = ["RE", "MU", "TH", "WA", "FI", "SI"]
+LEVELS = ["SR", "SR", "SR", "JR"]
+COUNTRIES = ["US"] * 18 + ["CN", "IN", "CA", "KR"]
+TERMS = ["FA23", "WI24", "SP24", "S124", "S224", "FA24", "WI25", "SP25"]
+GRADES = ["A+", "A", "A-", "B+", "B", "B-", "C+", "C", "P", "W", "w"]
+UNITS = ["4.0", "4.0", "4.0", "4.0", "2.0", "1.0", "5.0", "4"]
+CLASS_TYPES = list(pbk_styling.CLASS_TYPES)
+EXTERNAL_DEPARTMENTS = ["CIS", "MATH", "ENGL", "HIST", "BIOL", "CHEM", "SPAN", "ECON"]
+
+# Departments always present (ALWAYS_INCLUDE_DEPT) plus synthetic ones
+BASE_DEPARTMENTS = list(pbk_styling.ALWAYS_INCLUDE_DEPT)
+
+
+def _department_names(count: int) -> List[str]:
+    names = list(BASE_DEPARTMENTS)
+    i = 0
+    while len(names) < count:
+        names.append(f"D{i:03d}")
+        i += 1
+    return names[:count]
+
+
+def _course_number(rng: random.Random) -> str:
+    number = str(rng.choice([rng.randint(1, 99), rng.randint(100, 199)]))
+    if rng.random() < 0.05:
+        return "90"
+    if rng.random() < 0.3:
+        number += rng.choice("ABCDLR")
+    return number
+
+
+def _write_csv(path: str, header: List[str], rows: Any) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate_cohort(
+    output_dir: str,
+    students: int,
+    class_rows: Optional[int] = None,
+    departments: int = 120,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    Write pbk_screening.csv, the four class files, coursecrit.csv and the
+    reference tables for a synthetic cohort to output_dir.
+    Returns the number of data rows written per file.
+    """
+    rng = random.Random(seed)
+    if class_rows is None:
+        class_rows = students * CLASSES_PER_STUDENT
+    os.makedirs(output_dir, exist_ok=True)
+    counts: Dict[str, int] = {}
+
+    ids = [f"A{i:07d}" for i in range(students)]
+    dept_names = _department_names(departments)
+
+    # coursecrit.csv: exact rules, split/combined letter forms and wildcards
+    rules = []
+    for dept in dept_names:
+        for _ in range(15):
+            number = _course_number(rng)
+            c_num = "".join(ch for ch in number if ch.isdigit())
+            c_let = "".join(ch for ch in number if not ch.isdigit())
+            if rng.random() < 0.5:
+                c_num, c_let = number, ""
+            rules.append([dept, c_num, c_let, "N", rng.choice(CLASS_TYPES)])
+        if rng.random() < 0.3:
+            rules.append([dept, "*", "", rng.choice("YN"), rng.choice(CLASS_TYPES)])
+    for exam in ("AP", "IB"):
+        for code in range(40):
+            rules.append([exam, f"X{code}", "", "N", rng.choice(CLASS_TYPES)])
+    _write_csv(
+        os.path.join(output_dir, "coursecrit.csv"),
+        COURSECRIT_HEADER,
+        ([i + 1] + rule for i, rule in enumerate(rules)),
+    )
+    counts["coursecrit.csv"] = len(rules)
+
+    def screening_rows() -> Any:
+        for i, pid in enumerate(ids):
+            first, last = f"First{i}", f"Last{i}"
+            yield [
+                f"{first} {last}",
+                first,
+                "",
+                last,
+                pid,
+                rng.choice(COLLEGES),
+                "BIOL",
+                "Biology",
+                rng.choice(LEVELS),
+                rng.choice("MFO"),
+                str(rng.randint(60, 220)),
+                f"{rng.uniform(3.5, 4.0):.2f}",
+                f"{first.lower()}{last.lower()}@ucsd.edu",
+                f"{i} Main St",
+                "La Jolla",
+                "CA",
+                str(92000 + i % 1000),
+                rng.choice(COUNTRIES),
+                f"(858) 555-{i % 10000:04d}",
+                "SP26",
+                "RG",
+                "FA24",
+            ]
+
+    _write_csv(
+        os.path.join(output_dir, "pbk_screening.csv"),
+        SCREENING_HEADER,
+        screening_rows(),
+    )
+    counts["pbk_screening.csv"] = students
+
+    def class_rows_iter() -> Any:
+        for i in range(class_rows):
+            number = _course_number(rng)
+            yield [
+                ids[rng.randrange(students)],
+                rng.choice(dept_names),
+                number,
+                rng.choice(TERMS),
+                "A00",
+                str(250000 + i),
+                rng.choice(UNITS),
+                rng.choice(GRADES),
+                "",
+                "",
+                "AC",
+                "EN",
+                "L",
+                "UD" if number[:1].isdigit() and len(number) >= 3 else "LD",
+                f"Course {number}",
+                "Instructor, Some",
+            ]
+
+    _write_csv(
+        os.path.join(output_dir, "pbk_screening_classes.csv"),
+        CLASSES_HEADER,
+        class_rows_iter(),
+    )
+    counts["pbk_screening_classes.csv"] = class_rows
+
+    def external_rows(kind: str, rows: int) -> Any:
+        for _ in range(rows):
+            pid = ids[rng.randrange(students)]
+            if kind == "transfer":
+                entity, name = "EC004692", "Santa Rosa Jr Coll"
+                dept, crsnum = rng.choice(EXTERNAL_DEPARTMENTS), _course_number(rng)
+                units, grade = rng.choice(["3", "4", "1"]), rng.choice(GRADES[:8])
+            else:
+                entity = "OTHRADPL" if kind == "AP" else "OTHRIBAC"
+                name = f"{kind} Examination"
+                dept, crsnum = kind, f"X{rng.randrange(50)}"
+                units, grade = rng.choice(["4.0", "6.0", "8.0"]), "P"
+            yield [
+                pid,
+                entity,
+                name,
+                dept,
+                crsnum,
+                f"{dept} {crsnum} Title",
+                rng.choice(TERMS),
+                "4580",
+                units,
+                grade,
+                "LD",
+                "",
+                "0",
+                "",
+                "",
+                "",
+                "",
+                "",
+                "0000",
+                "",
+                "2026-01-03",
+                f"{pid}-{entity}-{dept}-{crsnum}",
+            ]
+
+    for kind, filename, per_student in (
+        ("AP", "pbk_screening_apclasses.csv", 2.3),
+        ("IB", "pbk_screening_ibclasses.csv", 2.5),
+        ("transfer", "pbk_screening_transferclasses.csv", 2.5),
+    ):
+        rows = int(students * per_student)
+        _write_csv(
+            os.path.join(output_dir, filename),
+            EXTERNAL_CLASSES_HEADER,
+            external_rows(kind, rows),
+        )
+        counts[filename] = rows
+
+    # Reference tables are copied from the repository unchanged
+    for filename in sorted(pbk_styling.REFERENCE_TABLES):
+        with open(os.path.join(pbk_styling.BASE_DIR, filename), "rb") as src:
+            with open(os.path.join(output_dir, filename), "wb") as dst:
+                dst.write(src.read())
+
+    return counts
+
+
+def _process_peak_rss_mb() -> float:
+    # Peak RSS of the whole process so far, not of one stage; ru_maxrss is
+    # reported in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _measure(
+    results: List[Dict[str, Any]],
+    stage: str,
+    students: int,
+    func: Callable[[], Any],
+    trace_memory: bool,
+) -> Any:
+    """
+    Run func once and append its wall time and throughput to results, with
+    the peak traced Python memory of the stage when trace_memory is set and
+    the process's peak RSS so far.
+    """
+    if trace_memory:
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    value = func()
+    wall = time.perf_counter() - start
+
+    result: Dict[str, Any] = {
+        "stage": stage,
+        "wall_s": round(wall, 4),
+        "students_per_s": round(students / wall, 1) if wall > 0 else None,
+        "process_peak_rss_mb": round(_process_peak_rss_mb(), 1),
+    }
+    if trace_memory:
+        # Peak reached during the stage above what was allocated before it
+        peak = tracemalloc.get_traced_memory()[1] - traced_before
+        result["peak_traced_mb"] = round(peak / (1024 * 1024), 1)
+    results.append(result)
+    return value
+
+
+def _render(students: List[Any]) -> int:
+    template = pbk_styling.get_template()
+    size = 0
+    for chunk in template.generate(
+        students=students, class_types=pbk_styling.get_class_types()
+    ):
+        size += len(chunk)
+    return size
+
+
+def run_benchmark(
+    data_dir: str,
+    workers: List[int],
+    chunk_size: int = pbk_styling.DEFAULT_CHUNK_SIZE,
+    trace_memory: bool = True,
+    render: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Time each stage of a report run against the CSVs in data_dir.
+    Enrichment is repeated once per worker count to give a scaling curve.
+    With trace_memory each stage also reports the peak of the Python memory
+    it allocated (tracemalloc; memory used by worker processes is not traced).
+    """
+    results: List[Dict[str, Any]] = []
+    if trace_memory:
+        tracemalloc.start()
+
+    pbk_styling.set_data_dir(data_dir)
+    input_files = ["pbk_screening.csv", "coursecrit.csv"] + pbk_styling.CLASS_FILES
+
+    _measure(
+        results,
+        "load_csv",
+        0,
+        lambda: [pbk_styling._get_df(f) for f in input_files],
+        trace_memory,
+    )
+    students = _measure(
+        results, "get_students", 0, pbk_styling.get_students, trace_memory
+    )
+    count = len(students)
+    for result in results:
+        if result["wall_s"]:
+            result["students_per_s"] = round(count / result["wall_s"], 1)
+
+    # Every distinct course a report classifies, through the single and batch APIs
+    classes = pbk_styling._get_df("pbk_screening_classes.csv")
+    courses = classes[["dept", "crsnum"]].drop_duplicates()
+    numbers = courses["crsnum"].str.replace(r"[^0-9]", "", regex=True).tolist()
+    letters = courses["crsnum"].str.replace(r"[0-9]", "", regex=True).tolist()
+    depts = courses["dept"].tolist()
+
+    pbk_styling.clear_caches(tables=False)
+    _measure(
+        results,
+        f"map_class_types[{len(depts)} courses]",
+        count,
+        lambda: [
+            pbk_styling.map_class_types(d, n, l)
+            for d, n, l in zip(depts, numbers, letters)
+        ],
+        trace_memory,
+    )
+    pbk_styling.clear_caches(tables=False)
+    _measure(
+        results,
+        f"map_class_types_bulk[{len(depts)} courses]",
+        count,
+        lambda: pbk_styling.map_class_types_bulk(depts, numbers, letters),
+        trace_memory,
+    )
+
+    for worker_count in workers:
+        pbk_styling.clear_caches(tables=False)
+        students = pbk_styling.get_students()
+        _measure(
+            results,
+            f"enrich[workers={worker_count}]",
+            count,
+            lambda: pbk_styling.enrich_students(
+                students, workers=worker_count, chunk_size=chunk_size
+            ),
+            trace_memory,
+        )
+
+    students = _measure(
+        results,
+        "bin_students",
+        count,
+        lambda: pbk_styling.bin_students(students),
+        trace_memory,
+    )
+
+    if render:
+        _measure(results, "render", count, lambda: _render(students), trace_memory)
+
+    if trace_memory:
+        tracemalloc.stop()
+    return results
+
+
+def _print_results(results: List[Dict[str, Any]]) -> None:
+    columns = [
+        "stage",
+        "wall_s",
+        "students_per_s",
+        "peak_traced_mb",
+        "process_peak_rss_mb",
+    ]
+    columns = [c for c in columns if any(c in r for r in results)]
+    widths = {
+        c: max(len(c), *(len(str(r.get(c, ""))) for r in results)) for c in columns
+    }
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def _worker_counts(value: str) -> List[int]:
+    """
+    argparse type for --workers: comma-separated positive worker counts.
+    """
+    return [pbk_styling._positive_int(w) for w in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the PBK report.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Write a synthetic cohort")
+    generate.add_argument("--output", required=True, help="Output directory")
+    generate.add_argument(
+        "--size", choices=sorted(SIZES), help="Cohort preset (number of students)"
+    )
+    generate.add_argument(
+        "--students", type=pbk_styling._positive_int, help="Number of students"
+    )
+    generate.add_argument(
+        "--class-rows",
+        type=int,
+        help=f"Rows in pbk_screening_classes.csv (default: {CLASSES_PER_STUDENT} per student)",
+    )
+    generate.add_argument("--departments", type=int, default=120)
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = subparsers.add_parser("run", help="Benchmark the report stages")
+    run.add_argument("--data-dir", required=True, help="Directory with the CSVs")
+    run.add_argument(
+        "--workers",
+        type=_worker_counts,
+        default=[1],
+        help="Comma-separated worker counts for the enrichment scaling curve",
+    )
+    run.add_argument(
+        "--chunk-size",
+        type=pbk_styling._positive_int,
+        default=pbk_styling.DEFAULT_CHUNK_SIZE,
+    )
+    run.add_argument(
+        "--trace-memory",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Report the peak Python memory allocated by each stage with tracemalloc "
+        "(default: on; --no-trace-memory runs faster)",
+    )
+    run.add_argument("--no-render", action="store_true", help="Skip the render stage")
+    run.add_argument("--json", help="Also write the results to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        students = args.students or SIZES.get(args.size or "1k")
+        start = time.perf_counter()
+        counts = generate_cohort(
+            args.output,
+            students,
+            class_rows=args.class_rows,
+            departments=args.departments,
+            seed=args.seed,
+        )
+        for filename, rows in counts.items():
+            print(f"{filename}: {rows} rows")
+        print(f"Generated in {time.perf_counter() - start:.1f}s")
+        return
+
+    results = run_benchmark(
+        args.data_dir,
+        args.workers,
+        chunk_size=args.chunk_size,
+        trace_memory=args.trace_memory,
+        render=not args.no_render,
+    )
+    _print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
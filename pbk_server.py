@@ -0,0 +1,255 @@
+"""
+Local report server for pbk_styling.
+
+Keeps the input tables and classification structures loaded between requests
+and serves report pages rendered with pbk_styling.j2:
+
+    /                   the full report
+    /student/<pid>      one student
+    /bin/<n>            one bin
+
+    python pbk_server.py --port 8000 --data-dir /path/to/csvs
+
+Rendered pages are cached until one of the input CSVs changes; only the
+changed CSVs are read again.
+"""
+
+import argparse
+import copy
+import http.server
+import re
+import threading
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+import pbk_styling
+
+_STUDENT_PATH = re.compile(r"/student/([^/]+)")
+_BIN_PATH = re.compile(r"/bin/(\d+)")
+
+
+class ReportCache:
+    """
+    The cohort as served by the report server. Students are binned from the
+    class tables up front and enriched with their classes the first time a
+    page showing them is requested. Rendered pages are kept until one of the
+    input CSVs changes.
+
+    lock only guards the reload and this bookkeeping; pages are enriched and
+    rendered outside it, so a long page does not hold up other requests.
+    Students are enriched in the request thread: forking a worker pool from
+    a thread of a threaded server can leave the children holding locks that
+    other threads had taken at the time.
+    Enriched students are published as separate records that are never
+    modified afterwards, and results computed for an older generation of the
+    cohort are returned but not kept.
+    """
+
+    def __init__(self, chunk_size: int = pbk_styling.DEFAULT_CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        # Bumped whenever the cohort is rebuilt from changed tables
+        self.generation = 0
+        self.students: List[pbk_styling.Student] = []
+        # Position of each student id in the report (first one on duplicates)
+        self.positions: Dict[str, int] = {}
+        # Report slice of each bin: {bin: (start, end)}
+        self.bins: Dict[int, Tuple[int, int]] = {}
+        # Enriched copy of each student already shown, by position
+        self.enriched: Dict[int, pbk_styling.Student] = {}
+        self.pages: Dict[str, bytes] = {}
+
+    def refresh(self) -> List[str]:
+        """
+        Reload the CSVs that changed and, if any did, rebuild the cohort and
+        drop the rendered pages. Returns the reloaded tables.
+        """
+        changed = pbk_styling.reload_changed_tables()
+        if not changed:
+            return changed
+
+        pbk_styling._preload_class_data()
+        pbk_styling.get_template()
+        students = pbk_styling.bin_students(pbk_styling.get_students())
+
+        self.students = students
+        self.positions = {}
+        for position, student in enumerate(students):
+            self.positions.setdefault(student.get("id", ""), position)
+        self.bins = {
+            students[start]["bin"]: (start, end)
+            for _, start, end in pbk_styling._plan_shards(students, "bin", 0)
+        }
+        self.enriched = {}
+        self.pages = {}
+        self.generation += 1
+        return changed
+
+    def _slice(self, path: str) -> Optional[Tuple[int, int]]:
+        """
+        Report slice shown by a page, or None if the path is not a page.
+        """
+        if path == "/":
+            return 0, len(self.students)
+
+        match = _STUDENT_PATH.fullmatch(path)
+        if match:
+            position = self.positions.get(urllib.parse.unquote(match.group(1)))
+            return None if position is None else (position, position + 1)
+
+        match = _BIN_PATH.fullmatch(path)
+        if match:
+            return self.bins.get(int(match.group(1)))
+
+        return None
+
+    def page(self, path: str) -> Optional[bytes]:
+        """
+        Return the rendered page for path (UTF-8 HTML), or None if there is
+        no such page.
+        """
+        with self.lock:
+            self.refresh()
+            generation = self.generation
+
+            body = self.pages.get(path)
+            if body is not None:
+                return body
+
+            bounds = self._slice(path)
+            if bounds is None:
+                return None
+            start, end = bounds
+            students = [
+                self.enriched.get(i, self.students[i]) for i in range(start, end)
+            ]
+            pending = [i for i in range(start, end) if i not in self.enriched]
+
+        enriched = {i: copy.copy(students[i - start]) for i in pending}
+        if enriched:
+            pbk_styling.enrich_students(
+                list(enriched.values()),
+                workers=1,
+                chunk_size=self.chunk_size,
+            )
+            for i, student in enriched.items():
+                students[i - start] = student
+
+        html = pbk_styling.render_students(students, start + 1)
+        body = (html + "\n").encode("utf-8")
+
+        with self.lock:
+            if self.generation == generation:
+                for i, student in enriched.items():
+                    self.enriched.setdefault(i, student)
+                self.pages.setdefault(path, body)
+        return body
+
+
+class ReportRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: "ReportServer"
+
+    def do_GET(self) -> None:
+        started = time.perf_counter()
+        path = urllib.parse.urlsplit(self.path).path
+        try:
+            body = self.server.cache.page(path)
+        except Exception as e:
+            self.send_error(500, f"Error rendering {path}: {e}")
+            return
+
+        if body is None:
+            self.send_error(404, f"No report page at {path}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(
+            "Server-Timing", f"render;dur={(time.perf_counter() - started) * 1000:.1f}"
+        )
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ReportServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        cache: ReportCache,
+        quiet: bool = False,
+    ) -> None:
+        super().__init__(address, ReportRequestHandler)
+        self.cache = cache
+        self.quiet = quiet
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    chunk_size: int = pbk_styling.DEFAULT_CHUNK_SIZE,
+    quiet: bool = False,
+) -> ReportServer:
+    """
+    Load the report data from pbk_styling.DATA_DIR and return a server for it
+    (not yet serving; call serve_forever()). Port 0 picks a free port.
+    """
+    cache = ReportCache(chunk_size=chunk_size)
+    with cache.lock:
+        cache.refresh()
+    return ReportServer((host, port), cache, quiet=quiet)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve the PBK report over HTTP with the data kept loaded."
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="Port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=pbk_styling.BASE_DIR,
+        help="Directory containing the input CSV files (default: the script directory)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Keep parsed tables in this directory so restarts skip parsing",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="Do not log each request to stderr"
+    )
+    args = parser.parse_args()
+
+    pbk_styling.set_cache_dir(args.cache_dir)
+    if args.data_dir != pbk_styling.DATA_DIR:
+        pbk_styling.set_data_dir(args.data_dir)
+
+    server = create_server(args.host, args.port, quiet=args.quiet)
+    host, port = server.server_address[:2]
+    print(f"Serving the PBK report on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
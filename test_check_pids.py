@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import tempfile
+
+import check_pids
+
+
+class TestCheckPids(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file1 = os.path.join(self.tmp_dir.name, "a.csv")
+        self.file2 = os.path.join(self.tmp_dir.name, "b.csv")
+        with open(self.file1, "w", encoding="utf-8") as f:
+            f.write("PID,name\n")
+            for i in range(0, 300):
+                f.write(f"A{i:05d},x\n")
+        with open(self.file2, "w", encoding="utf-8") as f:
+            f.write("id,term\n")
+            for i in range(200, 500):
+                f.write(f" A{i:05d} ,FA25\n")
+            f.write("A00250,WI26\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_main(self, *args):
+        argv = ["check_pids.py", *args]
+        with (
+            patch("check_pids.sys.argv", argv),
+            patch("sys.stdout", new_callable=io.StringIO) as mock_stdout,
+        ):
+            check_pids.main()
+        return mock_stdout.getvalue()
+
+    def test_external_matches_in_memory(self):
+        expected = self.run_main(self.file1, self.file2)
+        self.assertIn("--- IDs unique to", expected)
+        self.assertIn("A00000\n", expected)
+        self.assertIn("A00499\n", expected)
+
+        self.assertEqual(
+            self.run_main("--memory-budget", "64", self.file1, self.file2), expected
+        )
+
+    def test_rejects_non_positive_memory_budget(self):
+        for budget in ("0", "-5", "x"):
+            with (
+                self.subTest(budget=budget),
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+                self.assertRaises(SystemExit),
+            ):
+                self.run_main("--memory-budget", budget, self.file1, self.file2)
+            self.assertIn("--memory-budget", mock_stderr.getvalue())
+
+    def test_external_buckets(self):
+        for buckets in (1, 7):
+            with check_pids.unique_ids_external(
+                self.file1, self.file2, 0, buckets=buckets
+            ) as (unique1, unique2):
+                self.assertEqual(list(unique1), [f"A{i:05d}" for i in range(0, 200)])
+                self.assertEqual(list(unique2), [f"A{i:05d}" for i in range(300, 500)])
+
+    def test_external_splits_capped_buckets(self):
+        expected = (
+            [f"A{i:05d}" for i in range(0, 200)],
+            [f"A{i:05d}" for i in range(300, 500)],
+        )
+        with (
+            patch("check_pids.MAX_BUCKETS", 2),
+            patch("check_pids.MIN_SPLIT_BYTES", 0),
+        ):
+            # Two buckets are too large for the budget: each is split again
+            with (
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+                patch(
+                    "check_pids._diff_bucket", wraps=check_pids._diff_bucket
+                ) as mock_diff,
+                check_pids.unique_ids_external(self.file1, self.file2, 20 * 1024) as (
+                    unique1,
+                    unique2,
+                ),
+            ):
+                self.assertEqual((list(unique1), list(unique2)), expected)
+            self.assertGreater(mock_diff.call_count, 2)
+            self.assertEqual(mock_stderr.getvalue(), "")
+
+            # Without further splits the budget cannot be met, which is reported
+            with (
+                patch("check_pids.MAX_SPLIT_DEPTH", 0),
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+                check_pids.unique_ids_external(self.file1, self.file2, 20 * 1024) as (
+                    unique1,
+                    unique2,
+                ),
+            ):
+                self.assertEqual((list(unique1), list(unique2)), expected)
+            self.assertIn("may exceed the memory budget", mock_stderr.getvalue())
+
+    def test_reader_matches_dict_reader(self):
+        import csv
+
+        path = os.path.join(self.tmp_dir.name, "odd.csv")
+        with open(path, "w", encoding="utf-8-sig") as f:
+            # BOM, mixed case header, repeated column, short, blank and quoted rows
+            f.write('name,Pid,pid\nx,1,2\ny,3\n\nz,4, 5 \nw,6,"7"\nv,8,\n')
+
+        with open(path, encoding="utf-8-sig") as f:
+            expected = [
+                row["pid"].strip() for row in csv.DictReader(f) if row.get("pid")
+            ]
+        self.assertEqual(list(check_pids.iter_ids_from_csv(path)), expected)
+        self.assertEqual(expected, ["2", "5", "7"])
+
+    def test_run_pair_concurrent(self):
+        with (
+            patch("check_pids.CONCURRENT_MIN_BYTES", 0),
+            patch("check_pids.os.cpu_count", return_value=2),
+        ):
+            ids1, ids2 = check_pids._run_pair(
+                check_pids.get_ids_from_csv, (self.file1,), (self.file2,)
+            )
+        self.assertEqual(ids1, {f"A{i:05d}" for i in range(0, 300)})
+        self.assertEqual(ids2, {f"A{i:05d}" for i in range(200, 500)})
+
+    def test_same_ids(self):
+        for args in ([], ["--memory-budget", "1"]):
+            self.assertEqual(
+                self.run_main(*args, self.file1, self.file1),
+                "No unique IDs found. Both files contain the exact same IDs.\n",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
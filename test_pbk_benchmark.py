@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+import io
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Ensure valid import
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pbk_benchmark
+import pbk_styling
+
+
+class TestPbkBenchmark(unittest.TestCase):
+
+    def tearDown(self):
+        pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+    def test_generate_cohort_matches_schema(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            counts = pbk_benchmark.generate_cohort(tmp_dir, 25, class_rows=300)
+            self.assertEqual(counts["pbk_screening.csv"], 25)
+            self.assertEqual(counts["pbk_screening_classes.csv"], 300)
+
+            # Same columns as the sample exports shipped with the repo
+            for filename in counts:
+                generated = pd.read_csv(os.path.join(tmp_dir, filename), nrows=0)
+                sample = pd.read_csv(
+                    os.path.join(pbk_styling.BASE_DIR, filename), nrows=0
+                )
+                self.assertEqual(list(generated.columns), list(sample.columns))
+
+    def test_run_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pbk_benchmark.generate_cohort(tmp_dir, 20, class_rows=150)
+            results = pbk_benchmark.run_benchmark(tmp_dir, workers=[1])
+
+        stages = [r["stage"] for r in results]
+        self.assertEqual(stages[:2], ["load_csv", "get_students"])
+        self.assertIn("enrich[workers=1]", stages)
+        self.assertEqual(stages[-2:], ["bin_students", "render"])
+        for result in results:
+            self.assertGreaterEqual(result["wall_s"], 0)
+            self.assertGreater(result["process_peak_rss_mb"], 0)
+            self.assertGreaterEqual(result["peak_traced_mb"], 0)
+
+    def test_main_rejects_non_positive_counts(self):
+        for argv in (
+            ["generate", "--output", "out", "--students", "0"],
+            ["run", "--data-dir", "data", "--workers", "1,0"],
+            ["run", "--data-dir", "data", "--workers", "-2"],
+        ):
+            with (
+                self.subTest(argv=argv),
+                patch("pbk_benchmark.sys.argv", ["pbk_benchmark.py", *argv]),
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+                patch("pbk_benchmark.run_benchmark") as mock_run,
+                patch("pbk_benchmark.generate_cohort") as mock_generate,
+                self.assertRaises(SystemExit),
+            ):
+                pbk_benchmark.main()
+            self.assertIn("must be a positive integer", mock_stderr.getvalue())
+            mock_run.assert_not_called()
+            mock_generate.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
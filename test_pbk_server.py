@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+# Ensure valid import
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pbk_server
+import pbk_styling
+
+
+class TestPbkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for filename in pbk_styling.INPUT_TABLES:
+            shutil.copy(
+                os.path.join(pbk_styling.BASE_DIR, filename),
+                os.path.join(self.tmp_dir.name, filename),
+            )
+        pbk_styling.set_data_dir(self.tmp_dir.name)
+
+        self.server = pbk_server.create_server(port=0, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        self.base_url = f"http://{host}:{port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+        self.tmp_dir.cleanup()
+
+    def fetch(self, path):
+        with urllib.request.urlopen(self.base_url + path) as response:
+            self.assertEqual(
+                response.headers["Content-Type"], "text/html; charset=utf-8"
+            )
+            return response.read().decode("utf-8")
+
+    def expected_report(self, students, first_index=1):
+        return pbk_styling.render_students(students, first_index) + "\n"
+
+    def test_pages(self):
+        students = pbk_styling.get_students()
+        pbk_styling.enrich_students(students)
+        students = pbk_styling.bin_students(students)
+
+        # A single student is numbered by its position in the full report
+        position = len(students) - 1
+        student = students[position]
+        self.assertEqual(
+            self.fetch(f"/student/{student['id']}"),
+            self.expected_report([student], position + 1),
+        )
+
+        in_bin = [s for s in students if s["bin"] == student["bin"]]
+        self.assertEqual(
+            self.fetch(f"/bin/{student['bin']}"),
+            self.expected_report(in_bin, students.index(in_bin[0]) + 1),
+        )
+
+        # The full report is the same as the one printed by pbk_styling.py
+        template = pbk_styling.get_template()
+        full = template.render(
+            students=students, class_types=pbk_styling.get_class_types()
+        )
+        self.assertEqual(self.fetch("/"), full + "\n")
+
+        for path in ("/student/unknown", "/bin/9", "/other"):
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                self.fetch(path)
+            self.assertEqual(error.exception.code, 404)
+
+    def test_lookup_not_blocked_by_full_report(self):
+        student_id = pbk_styling.get_students()[0]["id"]
+        render_students = pbk_styling.render_students
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_render_students(students, first_index=1):
+            if len(students) > 1:
+                started.set()
+                release.wait(10)
+            return render_students(students, first_index)
+
+        with patch("pbk_styling.render_students", slow_render_students):
+            full_report = threading.Thread(target=self.fetch, args=("/",))
+            full_report.start()
+            try:
+                self.assertTrue(started.wait(10))
+                # Served while the full report is still rendering
+                url = f"{self.base_url}/student/{student_id}"
+                with urllib.request.urlopen(url, timeout=5) as response:
+                    self.assertIn(student_id, response.read().decode("utf-8"))
+                self.assertFalse(release.is_set())
+            finally:
+                release.set()
+                full_report.join()
+        self.assertIn("/", self.server.cache.pages)
+
+    def test_reloads_changed_tables(self):
+        cache = self.server.cache
+        student_id = pbk_styling.get_students()[0]["id"]
+        before = self.fetch(f"/student/{student_id}")
+        self.assertIn(f"/student/{student_id}", cache.pages)
+        generation = cache.generation
+
+        # Unchanged files are not read again
+        self.assertEqual(pbk_styling.reload_changed_tables(), [])
+
+        path = os.path.join(self.tmp_dir.name, "pbk_screening_transferclasses.csv")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(
+                f"{student_id},EC000001,Test Coll,ZZ,1,Added Transfer Class,"
+                "SP25,4700,4,A,LD,,,,,,,,,,2025-11-18,\n"
+            )
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+        after = self.fetch(f"/student/{student_id}")
+        self.assertEqual(cache.generation, generation + 1)
+        self.assertNotEqual(after, before)
+        self.assertIn("Added Transfer Class", after)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,11 @@ from unittest.mock import patch, MagicMock
 import sys
 import os
 import io
+import json
+import importlib.util
+import itertools
+import subprocess
+import tempfile
 import pandas as pd
 
 # Ensure valid import
@@ -10,6 +15,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import pbk_styling
 
 
+def classify_each(departments, coursenumbers, courseletters):
+    """
+    Stand-in for map_class_types_bulk that classifies each course with
+    map_class_types, so tests can keep patching the single-course lookup.
+    """
+    return [
+        pbk_styling.map_class_types(*course)
+        for course in zip(departments, coursenumbers, courseletters)
+    ]
+
+
 class TestPbkStyling(unittest.TestCase):
 
     def test_get_class_types(self):
@@ -107,6 +123,317 @@ class TestPbkStyling(unittest.TestCase):
         result = pbk_styling.map_class_types("MATH", "101", "A")
         self.assertEqual(result, [])
 
+    @patch("pbk_styling._get_df")
+    def test_map_class_types_bulk(self, mock_get_df):
+        csv_content = (
+            "courseid,department,coursenumber,courseletter,anyUD,classtype\n"
+            "1,MIX,*,*,N,SS\n"
+            "2,MIX,*,*,Y,LS\n"
+            "3,BOTH,100,,N,MS\n"
+            "4,BOTH,*,*,Y,SS\n"
+            "5,AP,*,*,Y,LA\n"
+            "6,SIO,20R,,N,NS\n"
+        )
+        df = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+        mock_get_df.return_value = df
+
+        courses = [
+            ("MIX", "10", ""),
+            ("MIX", "150A", ""),
+            ("BOTH", "100", ""),
+            ("BOTH", "99", ""),
+            ("AP", "150", ""),
+            ("SIO", "20", "R"),
+            ("ART", "1", ""),
+        ]
+        expected = [sorted(pbk_styling.map_class_types(*c)) for c in courses]
+
+        departments, numbers, letters = (list(col) for col in zip(*courses))
+        result = pbk_styling.map_class_types_bulk(departments, numbers, letters)
+
+        self.assertEqual([sorted(r) for r in result], expected)
+        self.assertEqual(expected, [["SS"], ["LS"], ["MS", "SS"], [], [], ["NS"], []])
+
+        mock_get_df.return_value = None
+        self.assertEqual(pbk_styling.map_class_types_bulk(["MIX"], ["1"], [""]), [[]])
+
+    def test_course_rules_index(self):
+        csv_content = (
+            "courseid,department,coursenumber,courseletter,anyUD,classtype\n"
+            "1,MATH,101,A,N,MS\n"
+            "2,HIST,*,*,N,SS\n"
+            "3,HIST,*,*,Y,LS\n"
+            "4,HIST,*,*,X,NS\n"
+        )
+        df = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+
+        rules = pbk_styling._get_course_rules(df)
+        self.assertEqual(rules.exact[("MATH", "101", "A")], {"MS"})
+        self.assertEqual(rules.wildcard_lower["HIST"], {"SS"})
+        self.assertEqual(rules.wildcard_upper["HIST"], {"LS"})
+
+        # Same DataFrame reuses the compiled index, a reloaded one rebuilds it
+        self.assertIs(pbk_styling._get_course_rules(df), rules)
+        self.assertIsNot(pbk_styling._get_course_rules(df.copy()), rules)
+
+    @patch("pbk_styling._get_df")
+    def test_classification_cache(self, mock_get_df):
+        csv_content = (
+            "courseid,department,coursenumber,courseletter,anyUD,classtype\n"
+            "1,MATH,101,A,N,MS\n"
+            "2,HIST,*,*,N,SS\n"
+        )
+        df = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+        mock_get_df.return_value = df
+
+        pbk_styling.set_classification_cache_size(2)
+        try:
+            pbk_styling.map_class_types("MATH", "101", "A")
+            before = pbk_styling.get_classification_cache_stats()
+
+            # Repeated lookup is served from the cache
+            self.assertEqual(pbk_styling.map_class_types("MATH", "101", "A"), ["MS"])
+            stats = pbk_styling.get_classification_cache_stats()
+            self.assertEqual(stats["hits"], before["hits"] + 1)
+            self.assertEqual(stats["misses"], before["misses"])
+
+            # Third distinct key evicts the least recently used one
+            pbk_styling.map_class_types("HIST", "10", "")
+            pbk_styling.map_class_types("HIST", "20", "")
+            stats = pbk_styling.get_classification_cache_stats()
+            self.assertEqual(stats["size"], 2)
+            self.assertEqual(stats["evictions"], before["evictions"] + 1)
+
+            # Reloading coursecrit invalidates cached classifications
+            mock_get_df.return_value = df.assign(classtype="LS")
+            self.assertEqual(pbk_styling.map_class_types("MATH", "101", "A"), ["LS"])
+        finally:
+            pbk_styling.set_classification_cache_size(
+                pbk_styling.CLASSIFICATION_CACHE_SIZE
+            )
+
+    @patch("pbk_styling._get_df")
+    def test_classification_cache_ignores_stale_rules(self, mock_get_df):
+        csv_content = (
+            "courseid,department,coursenumber,courseletter,anyUD,classtype\n"
+            "1,HIST,*,*,N,SS\n"
+        )
+        old = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+        new = old.assign(classtype="LA")
+        mock_get_df.return_value = new
+
+        # A lookup still holding the old rules finishes after the reload
+        rules_old = pbk_styling._get_course_rules(old)
+        pbk_styling._get_course_rules(new)
+        pbk_styling._classify_course(rules_old, "HIST", "10", "", {"SS"})
+
+        self.assertEqual(pbk_styling.map_class_types("HIST", "10", ""), ["LA"])
+
+    def test_get_df_persistent_cache(self):
+        filename = "cache_test.csv"
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            patch("pbk_styling.DATA_DIR", tmp_dir),
+            patch("pbk_styling.CACHE_DIR", os.path.join(tmp_dir, "cache")),
+            patch.dict(pbk_styling._DFS, clear=True),
+        ):
+            csv_path = os.path.join(tmp_dir, filename)
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write("id,dept\n00123,MATH\n00456,\n")
+
+            df = pbk_styling._get_df(filename)
+            self.assertEqual(df["id"].tolist(), ["00123", "00456"])
+
+            # Warm run: served from the cache without parsing the CSV
+            pbk_styling._DFS.clear()
+            with patch("pbk_styling.pd.read_csv", side_effect=AssertionError):
+                cached = pbk_styling._get_df(filename)
+            pd.testing.assert_frame_equal(cached, df)
+
+            # Changing the source invalidates the entry
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write("id,dept\n00789,HIST\n")
+            pbk_styling._DFS.clear()
+            self.assertEqual(pbk_styling._get_df(filename)["id"].tolist(), ["00789"])
+
+            # A save while the CSV is being parsed is not cached as the old table
+            read_csv = pbk_styling.pd.read_csv
+
+            def read_csv_while_saving(*args, **kwargs):
+                with open(csv_path, "w", encoding="utf-8") as f:
+                    f.write("id,dept\n00999,BIOL\n")
+                os.utime(csv_path, ns=(0, os.stat(csv_path).st_mtime_ns + 1))
+                return read_csv(*args, **kwargs)
+
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write("id,dept\n00321,PHYS\n")
+            pbk_styling._DFS.clear()
+            with patch("pbk_styling.pd.read_csv", side_effect=read_csv_while_saving):
+                self.assertEqual(
+                    pbk_styling._get_df(filename)["id"].tolist(), ["00321"]
+                )
+            pbk_styling._DFS.clear()
+            self.assertEqual(pbk_styling._get_df(filename)["id"].tolist(), ["00999"])
+
+    def test_get_df_applies_table_schema(self):
+        filename = "pbk_screening_transferclasses.csv"
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            patch("pbk_styling.DATA_DIR", tmp_dir),
+            patch("pbk_styling.CACHE_DIR", None),
+            patch.dict(pbk_styling._DFS, clear=True),
+        ):
+            with open(os.path.join(tmp_dir, filename), "w", encoding="utf-8") as f:
+                f.write(
+                    "id,entityname,dept,crsnum,title,units,grade,refresh\n"
+                    "00123,Coll,MATH,1A,Calculus,4,A,2025-11-18\n"
+                    "00456,Coll,HIST,2,History,,,2025-11-18\n"
+                )
+
+            df = pbk_styling._get_df(filename)
+
+            # Unused columns are not loaded
+            self.assertEqual(
+                list(df.columns), ["id", "dept", "crsnum", "title", "units", "grade"]
+            )
+            self.assertIsInstance(df["dept"].dtype, pd.CategoricalDtype)
+            self.assertNotIsInstance(df["id"].dtype, pd.CategoricalDtype)
+            self.assertEqual(df["id"].tolist(), ["00123", "00456"])
+            # Missing values in categorical columns still read as ""
+            self.assertEqual(df["grade"].tolist(), ["A", ""])
+            self.assertEqual(df["units"].tolist(), ["4", ""])
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("pyarrow"), "pyarrow is not installed"
+    )
+    def test_get_df_pyarrow_engine(self):
+        contents = {
+            "too_many_fields": "00789,Coll,BIO,1,Biology,4,B,2025-11-18,extra\n",
+            "too_few_fields": "00789,Coll,BIO\n",
+        }
+        for (name, extra_row), filename in itertools.product(
+            contents.items(), ["pbk_screening_transferclasses.csv", "other.csv"]
+        ):
+            with (
+                tempfile.TemporaryDirectory() as tmp_dir,
+                patch("pbk_styling.DATA_DIR", tmp_dir),
+                patch("pbk_styling.CACHE_DIR", None),
+                patch.dict(pbk_styling._DFS, clear=True),
+            ):
+                with open(os.path.join(tmp_dir, filename), "w") as f:
+                    f.write(
+                        "id,entityname,dept,crsnum,title,units,grade,refresh\n"
+                        "00123,Coll,MATH,1A,Calculus,4,A,2025-11-18\n"
+                        "00456,Coll,HIST,2,NA,,,2025-11-18\n" + extra_row
+                    )
+
+                expected = pbk_styling._get_df(filename)
+                try:
+                    pbk_styling.set_csv_engine("pyarrow")
+                    df = pbk_styling._get_df(filename)
+                finally:
+                    pbk_styling.set_csv_engine("c")
+
+            with self.subTest(name, filename=filename):
+                self.assertEqual(list(df.columns), list(expected.columns))
+                self.assertEqual(df.values.tolist(), expected.values.tolist())
+                self.assertEqual(list(df.dtypes), list(expected.dtypes))
+                if isinstance(df["dept"].dtype, pd.CategoricalDtype):
+                    self.assertEqual(
+                        df["dept"].cat.categories.tolist(),
+                        expected["dept"].cat.categories.tolist(),
+                    )
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow"), "pyarrow is installed")
+    def test_set_csv_engine_without_pyarrow(self):
+        with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+            pbk_styling.set_csv_engine("pyarrow")
+        self.assertEqual(pbk_styling.CSV_ENGINE, "c")
+
+    def test_preload_tables(self):
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            patch("pbk_styling.DATA_DIR", tmp_dir),
+            patch("pbk_styling.CACHE_DIR", None),
+            patch.dict(pbk_styling._DFS, clear=True),
+            patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+        ):
+            with open(os.path.join(tmp_dir, "coursecrit.csv"), "w") as f:
+                f.write("department,coursenumber,courseletter,anyUD,classtype\n")
+                f.write("MATH,20,A,N,MS\n")
+            with open(os.path.join(tmp_dir, "colleges.csv"), "w") as f:
+                f.write("college_code,college_name\nRE,Revelle\n")
+            # Not valid UTF-8
+            with open(os.path.join(tmp_dir, "pbk_screening.csv"), "wb") as f:
+                f.write(b"PID,College\n\xff\xfe,RE\n")
+
+            errors = pbk_styling.preload_tables()
+
+            self.assertEqual(list(errors), ["pbk_screening.csv"])
+            self.assertIn("pbk_screening.csv", mock_stderr.getvalue())
+            self.assertEqual(set(pbk_styling._DFS), set(pbk_styling.INPUT_TABLES))
+            self.assertIsNone(pbk_styling._DFS["pbk_screening.csv"])
+            self.assertIsNone(pbk_styling._DFS["pbk_screening_classes.csv"])
+            self.assertEqual(pbk_styling._DFS["coursecrit.csv"]["classtype"][0], "MS")
+            self.assertEqual(
+                pbk_styling._DFS["colleges.csv"]["college_name"], ["Revelle"]
+            )
+
+            # Loaded tables are not read again
+            with patch("pbk_styling._load_table") as mock_load:
+                self.assertEqual(pbk_styling.preload_tables(), {})
+                mock_load.assert_not_called()
+
+    def test_import_is_lazy(self):
+        deferred = ["pandas", "jinja2", "multiprocessing", "concurrent.futures"]
+        code = (
+            "import sys, pbk_styling\n"
+            "print(pbk_styling.IMPORT_TIME_MS)\n"
+            f"print([m for m in {deferred!r} if m in sys.modules])\n"
+        )
+        # Best of a few runs, so a busy machine does not fail the budget
+        timings = []
+        for _ in range(3):
+            result = subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=pbk_styling.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            import_ms, loaded = result.stdout.splitlines()
+            self.assertEqual(loaded, "[]")
+            timings.append(float(import_ms))
+
+        self.assertLess(
+            min(timings),
+            pbk_styling.IMPORT_TIME_BUDGET_MS,
+            f"import pbk_styling took {min(timings):.1f} ms",
+        )
+
+    def test_read_reference_table(self):
+        csv_content = (
+            "country_code,country_name,include_city\n"
+            "US,United States,N\n"
+            "\n"
+            'CA,"Canada",Y\n'
+            "XX,N/A\n"
+            "YY,Too,Many,Fields\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "country_codes.csv")
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write(csv_content)
+
+            table = pbk_styling._read_reference_table(csv_path)
+            df = pd.read_csv(
+                csv_path, dtype=str, encoding="utf-8", on_bad_lines="skip"
+            ).fillna("")
+
+        # Same values as the pandas path in _get_df
+        self.assertEqual(table, {col: df[col].tolist() for col in df.columns})
+        self.assertEqual(table["country_name"], ["United States", "Canada", ""])
+
     @patch("pbk_styling._get_df")
     def test_get_students(self, mock_get_df):
         headers = "Full Name,First Name,Middle Name,Last Name,PID,College,Major Code,Major Description,Class Level,Gender,Cumulative Units,Cumulative GPA,Email(UCSD),Permanent Mailing Addresss Line 1,Permanent Mailing City Line 1,Permanent Mailing State Line 1,Permanent Mailing Zip Code Line 1,Permanent Mailing Country Line 1,Permanent Phone Number,Graduating Quarter,Registration Status"
@@ -154,6 +481,7 @@ class TestPbkStyling(unittest.TestCase):
 
     @patch("pbk_styling.map_class_types")
     @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
     def test_get_classes(self, mock_get_df, mock_map):
         headers = "id,dept,crsnum,grade,units"
         # 1. Valid class
@@ -310,6 +638,150 @@ class TestPbkStyling(unittest.TestCase):
         self.assertEqual(len(t_classes), 1)
         self.assertEqual(t_classes[0]["title"], "Transfer 101")
 
+    @patch("pbk_styling.map_class_types")
+    @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
+    def test_get_classes_classifies_each_course_once(self, mock_get_df, mock_map):
+        headers = "id,dept,crsnum,grade,units"
+        rows = [
+            "11111,MATH,20A,A,4.0",
+            "22222,MATH,20A,B,4.0",
+            "22222,MATH,20A,W,4.0",
+            "33333,HUM,1,P,4.0",
+        ]
+        csv_content = f"{headers}\n" + "\n".join(rows)
+        df = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+        mock_get_df.return_value = df
+        mock_map.side_effect = lambda d, n, l: ["MS"] if d == "MATH" else []
+
+        classes = pbk_styling.get_classes("22222")
+        self.assertEqual(
+            classes["MS"],
+            [{"dept": "MATH", "crsnum": "20A", "grade": "B", "types": ["MS"]}],
+        )
+        self.assertEqual(pbk_styling.get_classes("33333")["LS"][0]["types"], ["LS"])
+
+        # The whole table is classified up front, one lookup per distinct course
+        self.assertEqual(mock_map.call_count, 2)
+        mock_map.assert_any_call("MATH", "20", "A")
+
+    @patch("pbk_styling.map_class_types")
+    @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
+    def test_get_classes_missing_columns(self, mock_get_df, mock_map):
+        mock_map.side_effect = lambda d, n, l: ["MS"]
+
+        # Without units no class passes the units filter
+        csv_content = "id,dept,crsnum,grade\n12345,MATH,20,A\n"
+        mock_get_df.return_value = pd.read_csv(io.StringIO(csv_content), dtype=str)
+        self.assertEqual(pbk_styling.get_classes("12345")["MS"], [])
+
+        # Without grade the classes are kept with an empty grade
+        csv_content = "id,dept,crsnum,units\n12345,MATH,20,4.0\n"
+        mock_get_df.return_value = pd.read_csv(io.StringIO(csv_content), dtype=str)
+        self.assertEqual(
+            pbk_styling.get_classes("12345")["MS"],
+            [{"dept": "MATH", "crsnum": "20", "grade": "", "types": ["MS"]}],
+        )
+
+    @patch("pbk_styling.map_class_types")
+    @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
+    def test_get_classes_bulk(self, mock_get_df, mock_map):
+        headers = "id,dept,crsnum,grade,units"
+        rows = [
+            "11111,MATH,20,A,4.0",
+            "22222,PSYC,60,B,4.0",
+            "11111,MATH,10,A,4.0",
+        ]
+        csv_content = f"{headers}\n" + "\n".join(rows)
+        df = pd.read_csv(io.StringIO(csv_content), dtype=str).fillna("")
+        mock_get_df.return_value = df
+        mock_map.return_value = ["MS"]
+
+        result = pbk_styling.get_classes_bulk(["11111", "22222", "33333"])
+
+        self.assertEqual(list(result), ["11111", "22222", "33333"])
+        self.assertEqual([c["crsnum"] for c in result["11111"]["MS"]], ["10", "20"])
+        self.assertEqual([c["dept"] for c in result["22222"]["MS"]], ["PSYC"])
+        self.assertEqual(result["33333"]["MS"], [])
+
+    def test_enrich_students_workers(self):
+        # Uses the sample CSVs shipped with the repo
+        serial = pbk_styling.get_students()[:30]
+        parallel = pbk_styling.get_students()[:30]
+
+        pbk_styling.enrich_students(serial)
+        pbk_styling.enrich_students(parallel, workers=2, chunk_size=4)
+
+        self.assertEqual(
+            [s["csv_row"] for s in parallel], [s["csv_row"] for s in serial]
+        )
+        for expected, actual in zip(serial, parallel):
+            for key in ("classes", "apClasses", "ibClasses", "transferClasses"):
+                self.assertEqual(actual[key], expected[key])
+
+    def test_enrich_students_uses_bulk_lookups(self):
+        students = pbk_styling.get_students()[:5]
+        ids = [s["id"] for s in students]
+        expected = [pbk_styling._get_enriched_classes(s_id) for s_id in ids]
+
+        names = (
+            "get_classes",
+            "get_ap_classes",
+            "get_ib_classes",
+            "get_transfer_classes",
+        )
+        with patch.multiple(
+            "pbk_styling",
+            **{
+                f"{name}_bulk": MagicMock(wraps=getattr(pbk_styling, f"{name}_bulk"))
+                for name in names
+            },
+        ) as mocks:
+            pbk_styling.enrich_students(students)
+
+        # One call per class file for the whole batch
+        for mock in mocks.values():
+            mock.assert_called_once_with(ids)
+        for student, (classes, ap, ib, transfer) in zip(students, expected):
+            self.assertEqual(student["classes"], classes)
+            self.assertEqual(student["transferClasses"], transfer)
+
+    @patch("pbk_styling.multiprocessing.get_all_start_methods")
+    def test_enrich_students_spawned_workers(self, mock_start_methods):
+        # Without fork the spawned workers must read the same data dir
+        mock_start_methods.return_value = ["spawn"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for filename in pbk_styling.INPUT_TABLES:
+                with open(os.path.join(pbk_styling.BASE_DIR, filename), "rb") as f:
+                    data = f.read()
+                with open(os.path.join(tmp_dir, filename), "wb") as f:
+                    f.write(data)
+            student_id = pbk_styling.get_students()[3]["id"]
+            path = os.path.join(tmp_dir, "pbk_screening_classes.csv")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(f"{student_id},MATH,109,FA24,A00,1,4.0,A,,,AC,EN,L,UD,Test,\n")
+
+            pbk_styling.set_data_dir(tmp_dir)
+            try:
+                serial = pbk_styling.get_students()[:4]
+                parallel = pbk_styling.get_students()[:4]
+                pbk_styling.enrich_students(serial)
+                pbk_styling.enrich_students(parallel, workers=2, chunk_size=2)
+            finally:
+                pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+        # Class types come from sets, whose order differs between interpreters
+        def courses(student):
+            return {
+                class_type: [(c["dept"], c["crsnum"], c["grade"]) for c in items]
+                for class_type, items in student["classes"].items()
+            }
+
+        self.assertIn(("MATH", "109", "A"), courses(serial[3])["MS"])
+        self.assertEqual([courses(s) for s in parallel], [courses(s) for s in serial])
+
     @patch("pbk_styling.sys.argv", ["pbk_styling.py"])
     @patch("pbk_styling.print")
     @patch("pbk_styling.Environment")
@@ -349,6 +821,7 @@ class TestPbkStyling(unittest.TestCase):
 
     @patch("pbk_styling.map_class_types")
     @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
     def test_get_classes_sorting(self, mock_get_df, mock_map):
         headers = "id,dept,crsnum,grade,units"
         # Mixed order in CSV
@@ -570,6 +1043,7 @@ class TestPbkStyling(unittest.TestCase):
 
     @patch("pbk_styling.map_class_types")
     @patch("pbk_styling._get_df")
+    @patch("pbk_styling.map_class_types_bulk", classify_each)
     def test_get_classes_fixes(self, mock_get_df, mock_map):
         headers = "id,dept,crsnum,grade,units"
 
@@ -679,6 +1153,563 @@ class TestPbkStyling(unittest.TestCase):
         # Check for Canada (Toronto)
         self.assertIn("Canada (Toronto)", output)
 
+    def test_class_records(self):
+        import pickle
+
+        item = pbk_styling.ClassItem("MATH", "20A", "A", ["MS"])
+
+        # Records keep the dict-style access used by the template and report code
+        self.assertEqual(item["dept"], "MATH")
+        self.assertEqual(item.get("grade"), "A")
+        self.assertEqual(item.get("missing", "x"), "x")
+        self.assertIn("types", item)
+        self.assertEqual(
+            item, {"dept": "MATH", "crsnum": "20A", "grade": "A", "types": ["MS"]}
+        )
+        self.assertFalse(hasattr(item, "__dict__"))
+        with self.assertRaises(KeyError):
+            item["title"]
+
+        item["grade"] = "B"
+        self.assertEqual(item.grade, "B")
+
+        # Records cross process boundaries in --workers mode
+        self.assertEqual(pickle.loads(pickle.dumps(item)), item)
+
+    def test_get_template_reuses_environment(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("pbk_styling.CACHE_DIR", cache_dir):
+                env = pbk_styling.get_environment()
+                template = pbk_styling.get_template()
+
+                # Same Environment and compiled template on every call
+                self.assertIs(pbk_styling.get_environment(), env)
+                self.assertIs(pbk_styling.get_template(), template)
+                self.assertFalse(env.auto_reload)
+
+                # Compiled bytecode is persisted for the next run
+                self.assertTrue(os.listdir(os.path.join(cache_dir, "templates")))
+
+        # A different cache directory gets its own Environment
+        self.assertIsNot(pbk_styling.get_environment(), env)
+
+    def test_get_environment_unusable_cache_dir(self):
+        with tempfile.NamedTemporaryFile() as cache_file:
+            # templates/ cannot be created under a file
+            with (
+                patch("pbk_styling.CACHE_DIR", cache_file.name),
+                patch.dict(pbk_styling._ENVIRONMENT, clear=True),
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+            ):
+                env = pbk_styling.get_environment()
+                self.assertIsNone(env.bytecode_cache)
+                self.assertIn("<style>", pbk_styling.get_template().render(students=[]))
+            self.assertIn("not caching compiled templates", mock_stderr.getvalue())
+
+    def test_prepare_incremental_report(self):
+        import shutil
+
+        def full_report():
+            students = pbk_styling.get_students()
+            pbk_styling.enrich_students(students)
+            students = pbk_styling.bin_students(students)
+            return pbk_styling.get_template().render(
+                students=students, class_types=pbk_styling.get_class_types()
+            )
+
+        def incremental_report():
+            template, context = pbk_styling.prepare_incremental_report(
+                pbk_styling.get_students()
+            )
+            return template.render(**context)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "data")
+            os.mkdir(data_dir)
+            for name in os.listdir(pbk_styling.BASE_DIR):
+                if name.endswith(".csv") and name != "pbk_styling.py.csv":
+                    shutil.copy(os.path.join(pbk_styling.BASE_DIR, name), data_dir)
+
+            try:
+                pbk_styling.set_data_dir(data_dir)
+                with patch("pbk_styling.CACHE_DIR", os.path.join(tmp_dir, "cache")):
+                    expected = full_report()
+                    self.assertEqual(incremental_report(), expected)
+
+                    # Nothing changed: no student is enriched again
+                    with patch(
+                        "pbk_styling.enrich_students",
+                        wraps=pbk_styling.enrich_students,
+                    ) as mock_enrich:
+                        self.assertEqual(incremental_report(), expected)
+                        self.assertEqual(mock_enrich.call_args[0][0], [])
+
+                    # A new transfer class only invalidates that student
+                    transfer_path = os.path.join(
+                        data_dir, "pbk_screening_transferclasses.csv"
+                    )
+                    with open(transfer_path, "a", encoding="utf-8") as f:
+                        f.write(
+                            "A0000000,EC1,Coll,HIST,1,World History,SP13,4610,"
+                            "4,A,LD,,,,,,,,,,,\n"
+                        )
+                    pbk_styling.clear_caches()
+
+                    expected = full_report()
+                    self.assertIn("World History", expected)
+                    with patch(
+                        "pbk_styling.enrich_students",
+                        wraps=pbk_styling.enrich_students,
+                    ) as mock_enrich:
+                        self.assertEqual(incremental_report(), expected)
+                        changed = mock_enrich.call_args[0][0]
+                        self.assertEqual([s["id"] for s in changed], ["A0000000"])
+
+                    # The replaced fragment is pruned: one entry per student
+                    fragments_dir = pbk_styling._fragment_dir()
+                    fragments = [
+                        os.path.join(root, name)
+                        for root, _, names in os.walk(fragments_dir)
+                        for name in names
+                        if root != fragments_dir
+                    ]
+                    self.assertEqual(len(fragments), len(pbk_styling.get_students()))
+                    with open(fragments[0], encoding="utf-8") as f:
+                        self.assertIsInstance(json.load(f), list)
+
+                    # Another data dir sharing the cache dir keeps these fragments
+                    other_dir = os.path.join(tmp_dir, "other")
+                    shutil.copytree(data_dir, other_dir)
+                    pbk_styling.set_data_dir(other_dir)
+                    self.assertEqual(incremental_report(), expected)
+                    pbk_styling.set_data_dir(data_dir)
+                    with patch(
+                        "pbk_styling.enrich_students",
+                        wraps=pbk_styling.enrich_students,
+                    ) as mock_enrich:
+                        self.assertEqual(incremental_report(), expected)
+                        self.assertEqual(mock_enrich.call_args[0][0], [])
+
+                    # Cached fragments are only read while the report renders
+                    with patch(
+                        "pbk_styling._load_fragment",
+                        wraps=pbk_styling._load_fragment,
+                    ) as mock_load:
+                        template, context = pbk_styling.prepare_incremental_report(
+                            pbk_styling.get_students()
+                        )
+                        mock_load.assert_not_called()
+                        self.assertEqual(template.render(**context), expected)
+                        self.assertEqual(mock_load.call_count, len(fragments))
+            finally:
+                pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+    def test_fragment_keys_follow_compiled_template(self):
+        import shutil
+
+        def incremental_report():
+            template, context = pbk_styling.prepare_incremental_report(
+                pbk_styling.get_students()
+            )
+            return template.render(**context)
+
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            patch("pbk_styling.BASE_DIR", tmp_dir),
+            patch("pbk_styling.CACHE_DIR", os.path.join(tmp_dir, "cache")),
+            patch.dict(pbk_styling._ENVIRONMENT, clear=True),
+        ):
+            template_path = os.path.join(tmp_dir, pbk_styling.TEMPLATE_NAME)
+            shutil.copy(
+                os.path.join(os.path.dirname(pbk_styling.__file__), "pbk_styling.j2"),
+                template_path,
+            )
+            students = pbk_styling.get_students()
+            keys = pbk_styling._student_input_keys(students)
+
+            with open(template_path, encoding="utf-8") as f:
+                source = f.read()
+            with open(template_path, "w", encoding="utf-8") as f:
+                f.write(
+                    source.replace(
+                        '<table class="student">', 'EDITED\n<table class="student">'
+                    )
+                )
+
+            # This process still renders with the template it compiled, so
+            # its fragments are stored under the old template's keys
+            self.assertEqual(pbk_styling._student_input_keys(students), keys)
+            self.assertNotIn("EDITED", incremental_report())
+
+            # A new process compiles the edited template and renders every student again
+            pbk_styling._ENVIRONMENT.clear()
+            self.assertEqual(incremental_report().count("EDITED"), len(students))
+
+    def test_prepare_incremental_report_without_coursecrit(self):
+        import shutil
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for filename in pbk_styling.INPUT_TABLES:
+                if filename != "coursecrit.csv":
+                    shutil.copy(os.path.join(pbk_styling.BASE_DIR, filename), tmp_dir)
+
+            try:
+                pbk_styling.set_data_dir(tmp_dir)
+                with patch("pbk_styling.CACHE_DIR", os.path.join(tmp_dir, "cache")):
+                    template, context = pbk_styling.prepare_incremental_report(
+                        pbk_styling.get_students()
+                    )
+                    report = template.render(**context)
+
+                students = pbk_styling.get_students()
+                pbk_styling.enrich_students(students)
+                students = pbk_styling.bin_students(students)
+                expected = pbk_styling.get_template().render(
+                    students=students, class_types=pbk_styling.get_class_types()
+                )
+            finally:
+                pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+        self.assertEqual(report, expected)
+
+    def test_iter_students_matches_get_students(self):
+        expected = pbk_styling.get_students()
+
+        # Small chunks so csv_row and the lookups cross several chunk boundaries
+        self.assertEqual(list(pbk_styling.iter_students(chunk_size=7)), expected)
+        self.assertEqual(list(pbk_styling.iter_students(chunk_size=1000)), expected)
+
+        # A read error part way through the file is not a shorter cohort
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            patch("pbk_styling.DATA_DIR", tmp_dir),
+            patch("sys.stdout", new_callable=io.StringIO) as mock_stdout,
+        ):
+            with open(os.path.join(tmp_dir, "pbk_screening.csv"), "w") as f:
+                f.write('id,name\n1,A\n2,B\n3,C\n4,"unterminated\n')
+            with self.assertRaisesRegex(RuntimeError, "after 2 rows"):
+                list(pbk_styling.iter_students(chunk_size=2))
+        self.assertEqual(mock_stdout.getvalue(), "")
+
+    def test_main_rejects_non_positive_sizes(self):
+        for args in (
+            ["--workers", "2", "--chunk-size", "0"],
+            ["--workers", "0"],
+            ["--read-chunk-size", "-1"],
+            ["--shard-by", "count", "--shard-size", "0", "--output", "out"],
+            ["--watch", "--output", "out", "--watch-interval", "0"],
+            ["--watch", "--output", "out", "--debounce", "-1"],
+        ):
+            with (
+                self.subTest(args=args),
+                patch("pbk_styling.sys.argv", ["pbk_styling.py", *args]),
+                patch("sys.stderr", new_callable=io.StringIO) as mock_stderr,
+                patch("pbk_styling._run_report") as mock_run_report,
+            ):
+                with self.assertRaises(SystemExit):
+                    pbk_styling.main()
+                self.assertIn("must be a positive", mock_stderr.getvalue())
+                mock_run_report.assert_not_called()
+
+    def test_main_profile(self):
+        import json
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profile_path = os.path.join(tmp_dir, "profile.json")
+            pstats_path = os.path.join(tmp_dir, "profile.pstats")
+            argv = [
+                "pbk_styling.py",
+                "--profile",
+                profile_path,
+                "--profile-top",
+                "3",
+                "--profile-pstats",
+                pstats_path,
+            ]
+            with patch("pbk_styling.sys.argv", argv), patch("pbk_styling.print"):
+                pbk_styling.main()
+
+            with open(profile_path, encoding="utf-8") as f:
+                profile = json.load(f)
+            self.assertTrue(os.path.getsize(pstats_path) > 0)
+
+        stages = [stage["name"] for stage in profile["stages"]]
+        # Tables are loaded on a thread pool: per-file CPU is per thread
+        for stage in profile["stages"]:
+            scope = "thread" if stage["name"].startswith("load_csv[") else "process"
+            self.assertEqual(stage["cpu_scope"], scope, stage["name"])
+        for name in ["get_students", "enrich_students", "bin_students", "render"]:
+            self.assertIn(name, stages)
+        self.assertEqual(profile["enriched_students"], 100)
+        self.assertEqual(len(profile["slowest_students"]), 3)
+        costs = [student["wall_s"] for student in profile["slowest_students"]]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+
+        # Profiling is off again after the run
+        self.assertIsNone(pbk_styling.stop_profile())
+
+    def test_main_watch(self):
+        import shutil
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for filename in pbk_styling.INPUT_TABLES:
+                shutil.copy(os.path.join(pbk_styling.BASE_DIR, filename), tmp_dir)
+            output_path = os.path.join(tmp_dir, "report.html")
+            transfer_path = os.path.join(tmp_dir, "pbk_screening_transferclasses.csv")
+            argv = [
+                "pbk_styling.py",
+                "--data-dir",
+                tmp_dir,
+                "--output",
+                output_path,
+                "--watch",
+            ]
+            builds = []
+
+            def wait_for_changes(seen, interval, debounce):
+                with open(output_path, encoding="utf-8") as f:
+                    builds.append((f.read(), mock_render.call_count))
+                if len(builds) > 1:
+                    raise KeyboardInterrupt
+                with open(transfer_path, "a", encoding="utf-8") as f:
+                    f.write(
+                        "A0000000,EC000001,Test Coll,ZZ,1,Added Transfer Class,"
+                        "SP25,4700,4,A,LD,,,,,,,,,,2025-11-18,\n"
+                    )
+                os.utime(transfer_path, ns=(0, os.stat(transfer_path).st_mtime_ns + 1))
+                return ["pbk_screening_transferclasses.csv"]
+
+            try:
+                with (
+                    patch("pbk_styling.sys.argv", argv),
+                    patch("pbk_styling._wait_for_changes", wait_for_changes),
+                    patch(
+                        "pbk_styling._render_student_block",
+                        wraps=pbk_styling._render_student_block,
+                    ) as mock_render,
+                    patch("pbk_styling.sys.stderr", new_callable=io.StringIO),
+                ):
+                    pbk_styling.main()
+
+                students = pbk_styling.get_students()
+                pbk_styling.enrich_students(students)
+                students = pbk_styling.bin_students(students)
+                template = pbk_styling.get_template()
+                class_types = pbk_styling.get_class_types()
+                expected = template.render(students=students, class_types=class_types)
+            finally:
+                pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+        self.assertEqual(len(builds), 2)
+        self.assertNotIn("Added Transfer Class", builds[0][0])
+        self.assertEqual(builds[1][0], expected + "\n")
+        # Only the student whose transfer classes changed is rendered again
+        self.assertEqual(builds[1][1] - builds[0][1], 1)
+        self.assertIsNone(pbk_styling._MEMORY_FRAGMENTS)
+
+    def test_main_watch_keeps_report_on_read_error(self):
+        import shutil
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for filename in pbk_styling.INPUT_TABLES:
+                shutil.copy(os.path.join(pbk_styling.BASE_DIR, filename), tmp_dir)
+            output_path = os.path.join(tmp_dir, "report.html")
+            classes_path = os.path.join(tmp_dir, "pbk_screening_classes.csv")
+            argv = [
+                "pbk_styling.py",
+                "--data-dir",
+                tmp_dir,
+                "--output",
+                output_path,
+                "--watch",
+            ]
+            builds = []
+
+            def wait_for_changes(seen, interval, debounce):
+                with open(output_path, encoding="utf-8") as f:
+                    builds.append(f.read())
+                if len(builds) > 2:
+                    raise KeyboardInterrupt
+                # Caught mid-save: a truncated UTF-8 sequence fails the parse
+                with open(classes_path, "ab") as f:
+                    f.write(b"A0000000,\xc3\n")
+                os.utime(classes_path, ns=(0, os.stat(classes_path).st_mtime_ns + 1))
+                return ["pbk_screening_classes.csv"]
+
+            try:
+                with (
+                    patch("pbk_styling.sys.argv", argv),
+                    patch("pbk_styling._wait_for_changes", wait_for_changes),
+                    patch(
+                        "pbk_styling._run_report", wraps=pbk_styling._run_report
+                    ) as mock_run_report,
+                    patch(
+                        "pbk_styling.sys.stderr", new_callable=io.StringIO
+                    ) as mock_stderr,
+                ):
+                    pbk_styling.main()
+            finally:
+                pbk_styling.set_data_dir(pbk_styling.BASE_DIR)
+
+        self.assertEqual(len(builds), 3)
+        self.assertIn("<table", builds[0])
+        # The report is only written by the first build
+        self.assertEqual(builds[1:], [builds[0], builds[0]])
+        self.assertEqual(mock_run_report.call_count, 1)
+        self.assertIn(
+            "could not read pbk_screening_classes.csv", mock_stderr.getvalue()
+        )
+
+    def test_wait_for_changes_debounces(self):
+        clock = [0.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        saves = [{"a": 1}, {"a": 1}, {"a": 2}, {"a": 3}, {"a": 3}, {"a": 3}, {"a": 3}]
+        with (
+            patch("pbk_styling.INPUT_TABLES", ["a"]),
+            patch("pbk_styling._input_fingerprints", side_effect=saves),
+            patch("pbk_styling.time.sleep", side_effect=sleep),
+            patch("pbk_styling.time.monotonic", side_effect=lambda: clock[0]),
+        ):
+            changed = pbk_styling._wait_for_changes({"a": 1}, 0.5, 1.0)
+
+        self.assertEqual(changed, ["a"])
+        # Rebuilt 1s after the last save in the burst, not after the first one
+        self.assertEqual(clock[0], 2.5)
+
+    def test_write_sharded_report(self):
+        import json
+
+        students = pbk_styling.get_students()
+        pbk_styling.enrich_students(students)
+        students = pbk_styling.bin_students(students)
+        template = pbk_styling.get_template()
+        class_types = pbk_styling.get_class_types()
+        full = template.render(students=students, class_types=class_types) + "\n"
+        # Text before the student loop, repeated at the top of every shard
+        prefix = template.render(students=[], class_types=class_types)
+
+        for shard_by, workers in (("bin", 2), ("count", 1)):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                manifest = pbk_styling.write_sharded_report(
+                    students, tmp_dir, shard_by=shard_by, shard_size=30, workers=workers
+                )
+                with open(os.path.join(tmp_dir, "manifest.json")) as f:
+                    self.assertEqual(json.load(f), manifest)
+
+                bodies = []
+                for shard in manifest["shards"]:
+                    with open(os.path.join(tmp_dir, shard["file"])) as f:
+                        content = f.read()
+                    self.assertTrue(content.startswith(prefix))
+                    bodies.append(content[len(prefix) : -1])
+
+            # Shards joined back together give the single-file report
+            self.assertEqual(prefix + "".join(bodies) + "\n", full)
+            self.assertEqual(manifest["shards"][-1]["last_index"], len(students))
+
+        self.assertEqual(
+            [shard["students"] for shard in manifest["shards"]], [30, 30, 30, 10]
+        )
+
+    def test_bin_students_from_tables(self):
+        enriched = pbk_styling.get_students()
+        pbk_styling.enrich_students(enriched)
+
+        def expected_bin(student):
+            has_la = any(
+                student[key]["LA"] for key in ("classes", "apClasses", "ibClasses")
+            )
+            if (
+                student["college"] not in ("RE", "FI")
+                and not has_la
+                and student["pm_country"] == "US"
+            ):
+                return 1
+            return 2 if len(student["transferClasses"]) >= 8 else 3
+
+        expected = sorted(enriched, key=expected_bin)
+        self.assertEqual(
+            {expected_bin(s) for s in enriched}, {1, 2, 3}, "sample covers all bins"
+        )
+
+        # Bins come from the class tables, so enrichment is not needed first
+        students = pbk_styling.bin_students(pbk_styling.get_students())
+        self.assertEqual([s["id"] for s in students], [s["id"] for s in expected])
+        self.assertEqual(
+            [s["bin"] for s in students], [expected_bin(s) for s in expected]
+        )
+
+        # Students without any classes on file
+        students = pbk_styling.bin_students(
+            [
+                {"id": "X1", "college": "RE", "pm_country": "US"},
+                {"id": "X2", "college": "MU", "pm_country": "US"},
+                {"id": "X3", "college": "MU", "pm_country": "CA"},
+            ]
+        )
+        self.assertEqual(
+            [(s["id"], s["bin"]) for s in students], [("X2", 1), ("X1", 3), ("X3", 3)]
+        )
+
+    def test_sort_by_course(self):
+        df = pd.DataFrame(
+            {
+                "id": ["2", "1", "1", "1", "1", "1", "1"],
+                "dept": ["ANTH", "MATH", "ANTH", "ANTH", "ANTH", "ANTH", "ANTH"],
+                "crsnum": ["1", "1", "100A", "10", "2", "10", "AP"],
+                "title": ["a", "b", "c", "d", "e", "f", "g"],
+            }
+        )
+        df["dept"] = df["dept"].astype("category")
+
+        sorted_df = pbk_styling._sort_by_course(df)
+
+        # Numeric course order ("AP" has no number and sorts as 0), ties keep
+        # their original order, and the result matches _course_sort_key
+        self.assertEqual(
+            sorted_df["title"].tolist(), ["g", "e", "d", "f", "c", "b", "a"]
+        )
+        for _, rows in sorted_df.groupby("id", sort=False):
+            records = rows.to_dict("records")
+            self.assertEqual(records, sorted(records, key=pbk_styling._course_sort_key))
+
+    def test_write_html_report(self):
+        env = pbk_styling.Environment(
+            loader=pbk_styling.FileSystemLoader(pbk_styling.BASE_DIR)
+        )
+        template = env.get_template("pbk_styling.j2")
+
+        student = {
+            "csv_row": 1,
+            "name": "Test Student",
+            "id": "12345",
+            "classes": {k: [] for k in pbk_styling.CLASS_TYPES},
+            "apClasses": {k: [] for k in pbk_styling.CLASS_TYPES},
+            "ibClasses": {k: [] for k in pbk_styling.CLASS_TYPES},
+            "apTransferClasses": [],
+            "ibTransferClasses": [],
+            "transferClasses": [],
+            "college": "MU",
+            "college_name": "Muir",
+            "level": "SR",
+            "bin": 1,
+        }
+        context = {"students": [student], "class_types": pbk_styling.CLASS_TYPES}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "report.html")
+            pbk_styling.write_html_report(template, output_path, **context)
+
+            with open(output_path, encoding="utf-8") as f:
+                # Same bytes as the stdout mode: print(template.render(...))
+                self.assertEqual(f.read(), template.render(**context) + "\n")
+
+            # No temporary files are left behind
+            self.assertEqual(os.listdir(tmp_dir), ["report.html"])
+
     @patch("pbk_styling.sys.stdout", new_callable=io.StringIO)
     def test_generate_csv(self, mock_stdout):
         students = [